@@ -0,0 +1,12 @@
+import time
+
+# millisecond ticks. micropython has these built in, and they wrap, so always compare them with ticks_diff().
+try:
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_ms() -> int:
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(later: int, earlier: int) -> int:
+        return later - earlier
@@ -0,0 +1,235 @@
+import clock
+
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+# a frame is a list of (r, g, b) tuples, one per led, 0..255. the render loop builds a whole frame and hands it to
+# write_frame() on whichever output it was given.
+
+class PlasmaOutput:
+    """WS2812 / NeoPixel™ strip on a Pico's plasma stick"""
+
+    def __init__(self, num_leds):
+        # only exists on the pico, so don't make everyone else import it
+        import plasma
+        from plasma import plasma_stick
+        self._strip = plasma.WS2812(num_leds, 0, 0, plasma_stick.DAT, color_order=plasma.COLOR_ORDER_GRB)
+
+    def start(self) -> None:
+        self._strip.start()
+
+    def write_frame(self, frame) -> None:
+        for i in range(len(frame)):
+            (r, g, b) = frame[i]
+            self._strip.set_rgb(i, r, g, b)
+
+class MemoryOutput:
+    """keeps frames in memory, for tests and benchmarks"""
+
+    def __init__(self, num_leds, keep_history=False):
+        self.frame = [(0, 0, 0)] * num_leds
+        self.frame_count = 0
+        self.history = [] if keep_history else None
+
+    def start(self) -> None:
+        pass
+
+    def write_frame(self, frame) -> None:
+        self.frame = list(frame)
+        self.frame_count += 1
+        if self.history is not None:
+            self.history.append(self.frame)
+
+DDP_PORT = 4048
+DDP_HEADER_LEN = 10
+DDP_VERSION_1 = 0x40
+DDP_FLAG_PUSH = 0x01
+DDP_TYPE_RGB8 = 0x0B
+DDP_ID_DISPLAY = 0x01
+# keeps each packet inside a 1500 byte ethernet frame
+DDP_MAX_PIXELS_PER_PACKET = 480
+# a packet header costs about as much as 3 pixels, so it's cheaper to resend unchanged pixels across small gaps
+DDP_MERGE_GAP = 4
+# controllers go back to their own effects if they don't hear from us, so resend everything this often
+DDP_FULL_FRAME_INTERVAL_MS = 1000
+DDP_RESOLVE_RETRY_INTERVAL_MS = 5000
+# frames written faster than this (about 60 a second) are batched, and only the latest one is sent
+DDP_MIN_SEND_INTERVAL_MS = 15
+
+def get_changed_ranges(prev_frame, frame, merge_gap=DDP_MERGE_GAP):
+    """finds the runs of leds that differ between two frames
+
+    Args:
+        prev_frame (List[Tuple[int, int, int]]): what the controller is already showing, or None to send everything
+        frame (List[Tuple[int, int, int]]): what it should show now
+        merge_gap (int): runs separated by this many unchanged leds or fewer are sent as one
+
+    Returns:
+        List[Tuple[int, int]]: (first led index, led count) for each run, in order
+    """
+    if prev_frame is None or len(prev_frame) != len(frame):
+        return [(0, len(frame))] if len(frame) > 0 else []
+
+    ranges = []
+    start = None
+    end = 0
+    for i in range(len(frame)):
+        if frame[i] == prev_frame[i]:
+            continue
+        if start is not None and i - end > merge_gap:
+            ranges.append((start, end - start))
+            start = None
+        if start is None:
+            start = i
+        end = i + 1
+
+    if start is not None:
+        ranges.append((start, end - start))
+    return ranges
+
+def make_ddp_packets(frame, ranges, sequence):
+    """packs the given ranges of a frame into DDP packets, with push set on the last one so the controller shows them
+    all together
+
+    Args:
+        frame (List[Tuple[int, int, int]]): the whole frame
+        ranges (List[Tuple[int, int]]): (first led index, led count) to send
+        sequence (int): 1..15, 0 means unused
+
+    Returns:
+        List[bytes]: packets in send order
+    """
+    packets = []
+    for (first, count) in ranges:
+        for chunk_first in range(first, first + count, DDP_MAX_PIXELS_PER_PACKET):
+            chunk_count = min(DDP_MAX_PIXELS_PER_PACKET, first + count - chunk_first)
+            data = bytearray(chunk_count * 3)
+            for i in range(chunk_count):
+                (r, g, b) = frame[chunk_first + i]
+                data[i*3] = r
+                data[i*3 + 1] = g
+                data[i*3 + 2] = b
+            header = bytearray(DDP_HEADER_LEN)
+            header[0] = DDP_VERSION_1
+            header[1] = sequence & 0x0F
+            header[2] = DDP_TYPE_RGB8
+            header[3] = DDP_ID_DISPLAY
+            header[4:8] = (chunk_first * 3).to_bytes(4, "big")
+            header[8:10] = len(data).to_bytes(2, "big")
+            packets.append(header + data)
+
+    if len(packets) > 0:
+        packets[-1][0] |= DDP_FLAG_PUSH
+    return [bytes(packet) for packet in packets]
+
+class DdpOutput:
+    """streams frames over udp to a remote pixel controller (WLED, xLights, ...) using DDP. only the leds that changed
+    since the last frame are sent, and frames written within DDP_MIN_SEND_INTERVAL_MS of the last send are held back
+    and sent as the latest one by the next write_frame() or flush(). one host can drive lots of strips with one of these each."""
+
+    def __init__(self, num_leds, host, port=DDP_PORT):
+        self._num_leds = num_leds
+        self._host = host
+        self._port = port
+        self._addr = None
+        self._last_resolve_tickms = None
+        self._sock = None
+        self._pending_frame = None
+        self._prev_frame = None
+        self._sequence = 0
+        self._last_send_tickms = None
+        self._last_full_frame_tickms = None
+        self._send_failing = False
+
+    def start(self) -> None:
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._resolve()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+
+    def write_frame(self, frame) -> None:
+        if self._sock is None:
+            raise RuntimeError("DdpOutput.start() hasn't been called")
+        if len(frame) != self._num_leds:
+            raise ValueError(f"frame has {len(frame)} leds, expected {self._num_leds}")
+
+        self._pending_frame = list(frame)
+        if self._last_send_tickms is not None \
+                and clock.ticks_diff(clock.ticks_ms(), self._last_send_tickms) < DDP_MIN_SEND_INTERVAL_MS:
+            return
+        self.flush()
+
+    def flush(self) -> None:
+        """sends the latest frame written, if it hasn't been already"""
+        if self._pending_frame is None:
+            return
+        # the network might not have been up when we started
+        if self._addr is None and not self._resolve():
+            return
+
+        frame = self._pending_frame
+        self._pending_frame = None
+        now_tickms = clock.ticks_ms()
+        prev_frame = self._prev_frame
+        if self._last_full_frame_tickms is None \
+                or clock.ticks_diff(now_tickms, self._last_full_frame_tickms) >= DDP_FULL_FRAME_INTERVAL_MS:
+            prev_frame = None
+
+        ranges = get_changed_ranges(prev_frame, frame)
+        if len(ranges) == 0:
+            return
+
+        self._sequence = self._sequence % 15 + 1
+        self._last_send_tickms = now_tickms
+        try:
+            for packet in make_ddp_packets(frame, ranges, self._sequence):
+                self._sock.sendto(packet, self._addr)
+        except OSError as e:
+            # some of it might have got there, so we don't know what the controller's showing. send it all next time.
+            if not self._send_failing:
+                print(f"ddp send to {self._host} failed: {e}")
+            self._send_failing = True
+            self._prev_frame = None
+            return
+
+        if self._send_failing:
+            print(f"ddp send to {self._host} working again")
+        self._send_failing = False
+        self._prev_frame = frame
+        if prev_frame is None:
+            self._last_full_frame_tickms = now_tickms
+
+    def _resolve(self) -> bool:
+        # dns can block, so don't retry it every frame
+        now_tickms = clock.ticks_ms()
+        if self._last_resolve_tickms is not None \
+                and clock.ticks_diff(now_tickms, self._last_resolve_tickms) < DDP_RESOLVE_RETRY_INTERVAL_MS:
+            return False
+        self._last_resolve_tickms = now_tickms
+
+        try:
+            self._addr = socket.getaddrinfo(self._host, self._port)[0][-1]
+        except OSError as e:
+            print(f"couldn't resolve {self._host}: {e}")
+            return False
+        return True
+
+def make_output(name, num_leds, host=None):
+    """
+    Args:
+        name (str): "plasma", "ddp" or "memory"
+        num_leds (int):
+        host (str): where to send frames, for "ddp"
+    """
+    if name == "plasma":
+        return PlasmaOutput(num_leds)
+    if name == "ddp":
+        return DdpOutput(num_leds, host)
+    if name == "memory":
+        return MemoryOutput(num_leds)
+    raise ValueError(f"unknown led output {name}")
@@ -0,0 +1,211 @@
+import threading
+import time
+import socket
+import trains_push
+import led_outputs
+import trainline
+import trains_azure
+import cached_mileage
+
+# desktop checks against local stand-ins, run with `python local_checks.py`. cpython only.
+
+def serve_silent(server):
+    """accepts one subscriber and sends a snapshot, then plays dead without closing, like a server behind a dropped wifi link"""
+    conn, addr = server.accept()
+    length = int.from_bytes(conn.recv(4), "big")
+    conn.recv(length)
+    conn.sendall(trains_push.encode_message({"type": "snapshot", "lr": [], "rl": [], "now": 10}))
+    time.sleep(trains_push.FEED_TIMEOUT * 2)
+    conn.close()
+
+def wait_for(feed, seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        timetables = feed.poll()
+        if timetables is not None:
+            return timetables
+        time.sleep(0.05)
+    return None
+
+def listen():
+    server = socket.socket()
+    server.bind(("localhost", 0))
+    server.listen(1)
+    return server
+
+def stop(server):
+    # closing alone doesn't wake a thread blocked in accept()
+    try:
+        server.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    server.close()
+
+def start_publisher(update_interval, heartbeat_interval):
+    server = listen()
+    threading.Thread(target=trains_push.serve_simulated,
+                     kwargs={"update_interval": update_interval, "heartbeat_interval": heartbeat_interval, "server": server},
+                     daemon=True).start()
+    return server
+
+def check_push_feed():
+    feed_timeout = trains_push.FEED_TIMEOUT
+    trains_push.FEED_TIMEOUT = 1.5
+    servers = []
+    feed = None
+    try:
+        servers.append(start_publisher(1, 0.5))
+        feed = trains_push.TimetableFeed("localhost", servers[-1].getsockname()[1], use_tls=False)
+        assert feed.is_connect_due() and feed.connect()
+        snapshot = wait_for(feed, 2)
+        assert snapshot is not None and feed.is_connected()
+        update = wait_for(feed, 2)
+        assert update is not None and update.generatedAt > snapshot.generatedAt
+        feed.close()
+        # backs off rather than reconnecting straight away
+        assert not feed.is_connect_due()
+
+        # heartbeats alone keep us connected past the timeout
+        servers.append(start_publisher(100, 0.5))
+        feed = trains_push.TimetableFeed("localhost", servers[-1].getsockname()[1], use_tls=False)
+        assert feed.connect()
+        assert wait_for(feed, 2) is not None
+        assert wait_for(feed, trains_push.FEED_TIMEOUT * 2) is None
+        assert feed.is_connected()
+        feed.close()
+
+        # but silence drops us
+        servers.append(listen())
+        threading.Thread(target=serve_silent, args=(servers[-1],), daemon=True).start()
+        feed = trains_push.TimetableFeed("localhost", servers[-1].getsockname()[1], use_tls=False)
+        assert feed.connect()
+        assert wait_for(feed, 1) is not None
+        wait_for(feed, trains_push.FEED_TIMEOUT * 2)
+        assert not feed.is_connected()
+    finally:
+        trains_push.FEED_TIMEOUT = feed_timeout
+        if feed is not None:
+            feed.close()
+        for server in servers:
+            stop(server)
+    print("push feed ok")
+
+def receive_ddp(receiver):
+    """all the DDP packets waiting, as (push flag, byte offset, data length)"""
+    packets = []
+    try:
+        while True:
+            packet = receiver.recv(2048)
+            packets.append((packet[0] & led_outputs.DDP_FLAG_PUSH, int.from_bytes(packet[4:8], "big"), int.from_bytes(packet[8:10], "big")))
+    except socket.timeout:
+        pass
+    return packets
+
+def check_ddp_output():
+    full_frame_interval = led_outputs.DDP_FULL_FRAME_INTERVAL_MS
+    min_send_interval = led_outputs.DDP_MIN_SEND_INTERVAL_MS
+    # long enough that the check finishes before the full frame resend
+    led_outputs.DDP_FULL_FRAME_INTERVAL_MS = 60000
+    led_outputs.DDP_MIN_SEND_INTERVAL_MS = 0
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    output = None
+    try:
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(0.2)
+        output = led_outputs.DdpOutput(600, "127.0.0.1", receiver.getsockname()[1])
+        output.start()
+
+        frame = [(1, 2, 3)] * 600
+        output.write_frame(frame)
+        assert receive_ddp(receiver) == [(0, 0, 1440), (1, 1440, 360)]
+
+        frame[10] = (9, 9, 9)
+        frame[13] = (9, 9, 9)
+        frame[100] = (9, 9, 9)
+        output.write_frame(frame)
+        assert receive_ddp(receiver) == [(0, 30, 12), (1, 300, 3)]
+
+        output.write_frame(frame)
+        assert receive_ddp(receiver) == []
+
+        try:
+            output.write_frame(frame[1:])
+            assert False, "short frame was sent"
+        except ValueError:
+            pass
+
+        # frames written in a burst are held back, then only the latest is sent
+        led_outputs.DDP_MIN_SEND_INTERVAL_MS = 60000
+        for i in (200, 300, 400):
+            frame[i] = (9, 9, 9)
+            output.write_frame(frame)
+        assert receive_ddp(receiver) == []
+        output.flush()
+        assert receive_ddp(receiver) == [(0, 600, 3), (0, 900, 3), (1, 1200, 3)]
+        output.flush()
+        assert receive_ddp(receiver) == []
+    finally:
+        led_outputs.DDP_FULL_FRAME_INTERVAL_MS = full_frame_interval
+        led_outputs.DDP_MIN_SEND_INTERVAL_MS = min_send_interval
+        if output is not None:
+            output.close()
+        receiver.close()
+    print("ddp output ok")
+
+def check_render():
+    # one left-to-right train, halfway between the first two stations
+    lr_service = [{"crs": str(i), "time": 10 + i*0.1} for i in range(cached_mileage.station_count)]
+    timetables = trains_azure.Timetables([lr_service], [], 10.05)
+    now_ms = [0]
+    output = led_outputs.MemoryOutput(96, keep_history=True)
+    renderer = trainline.TrainlineRenderer(output, 96, lambda: now_ms[0])
+
+    renderer.render()
+    assert output.frame_count == 0
+
+    renderer.set_timetables(timetables)
+    renderer.render()
+    indicies = trainline.calc_timetable_indicies_at(10.05, [lr_service], [], 96)
+    train = indicies.lr[0]
+    assert train not in indicies.stations
+    for stn in indicies.stations:
+        assert output.frame[stn] == trainline.STATION_COL
+    assert output.frame[train] == trainline.LR_TRAIN_COL
+    assert output.frame[train + 1] == trainline.TRACK_COL
+
+    # once the train moves on it blends across to its next led
+    while output.frame[train + 1] == trainline.TRACK_COL:
+        now_ms[0] += 100
+        renderer.render()
+    assert output.frame[train] not in (trainline.LR_TRAIN_COL, trainline.TRACK_COL)
+    now_ms[0] += trainline.CHANGE_BLEND_DURATION * 1000
+    renderer.render()
+    assert output.frame[train] == trainline.TRACK_COL
+    assert output.frame[train + 1] == trainline.LR_TRAIN_COL
+
+    # errors stay up until there are new timetables
+    renderer.show_error()
+    renderer.render()
+    assert output.frame == [trainline.ERROR_COL] * 96
+    renderer.set_timetables(timetables)
+    renderer.render()
+    assert output.frame[indicies.stations[0]] == trainline.STATION_COL
+    print("render ok")
+
+def bench_render(frames=1000):
+    output = led_outputs.MemoryOutput(96)
+    renderer = trainline.TrainlineRenderer(output, 96)
+    renderer.set_timetables(trains_azure.get_simulated_timetables())
+    start = time.time()
+    for i in range(frames):
+        renderer.render()
+    elapsed = time.time() - start
+    assert output.frame_count == frames
+    print(f"render: {frames/elapsed:.0f} frames/s")
+
+if __name__=="__main__":
+    check_push_feed()
+    check_ddp_output()
+    check_render()
+    bench_render()
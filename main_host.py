@@ -0,0 +1,21 @@
+import trains_push
+import trainline
+import led_outputs
+
+# runs the display on a desktop or server instead of a pico, streaming to pixel controllers on the network.
+# (host, led count) for each strip, they all show the same line
+DDP_STRIPS = [
+    ("192.168.1.50", 96),
+]
+# the blend between frames is time-based, so a host can refresh faster than the pico does
+HOST_LED_REFRESH_INTERVAL = 1/60
+
+if __name__=="__main__":
+    renderers = []
+    for (host, num_leds) in DDP_STRIPS:
+        output = led_outputs.DdpOutput(num_leds, host)
+        output.start()
+        renderers.append(trainline.TrainlineRenderer(output, num_leds))
+
+    feed = trains_push.TimetableFeed() if trains_push.IS_ENABLED else None
+    trainline.run(renderers, feed, HOST_LED_REFRESH_INTERVAL)
@@ -0,0 +1,172 @@
+import trains_azure
+import cached_mileage
+import clock
+import math
+import collections
+import time
+
+# turns timetables into led frames. nothing pico-only in here, so it runs the same on a desktop driving network strips.
+
+NET_REFRESH_INTERVAL = 120
+LED_REFRESH_INTERVAL = 0.1
+CHANGE_BLEND_DURATION = 1
+SPEED_MULT = 2.0
+
+ERROR_COL = (255, 0, 0)
+LR_TRAIN_COL = (200, 100, 100)
+RL_TRAIN_COL = (100, 200, 100)
+STATION_COL = (150, 150, 150)
+TRACK_COL = (0, 0, 0)
+
+TrainlineIndicies = collections.namedtuple("TrainlineIndicies", ["stations", "lr", "rl"])
+
+def calc_timetable_indicies_at(now, lr_timetable, rl_timetable, num_leds) -> TrainlineIndicies:
+    total_separation = sum(cached_mileage.distances)
+    station_indicies = []
+    next_led_index = 0
+
+    # one more station than the separation between stations
+    for stn_index in range(cached_mileage.station_count):
+        if stn_index > 0:
+            # pad the tracks
+            track_length_between_stations = math.floor(num_leds * (cached_mileage.distances[stn_index-1]/total_separation))
+            next_led_index += track_length_between_stations
+
+        station_indicies.append(next_led_index)
+
+    # draw trains
+    lr_train_indices = []
+
+    (lr_train_positions, rl_train_positions) = trains_azure.get_train_positions_at(now, lr_timetable, rl_timetable)
+
+    for (prev_stn_index, prop) in lr_train_positions:
+        station_interval = station_indicies[prev_stn_index + 1] - station_indicies[prev_stn_index]
+        train_char_index = station_indicies[prev_stn_index] + math.floor(prop * station_interval)
+        lr_train_indices.append(train_char_index)
+
+    rl_train_indices = []
+
+    for (prev_stn_index, prop) in rl_train_positions:
+        # we're going left
+        station_interval = station_indicies[prev_stn_index] - station_indicies[prev_stn_index - 1]
+        train_char_index = station_indicies[prev_stn_index - 1] + math.floor(prop * station_interval)
+        rl_train_indices.append(train_char_index)
+
+    #station_names = trains_azure.get_station_names_from_timetable(lr_timetable)
+    #print(trains_ascii.render_ascii_tracks(lr_train_positions, rl_train_positions, station_names))
+
+    return TrainlineIndicies(station_indicies, lr_train_indices, rl_train_indices)
+
+def lerp_col(c0, c1, t: float):
+    """lerps between two arrays of identical lenght
+
+    Args:
+        c0 (List[float]]):
+        c1 (List[float]):
+        t (float): 0..1
+
+    Returns:
+        List[float]: memberwise lerp, does not clamp. floors to int.
+    """
+    return [math.floor(c0[i]*(1-t) + c1[i]*t) for i in range(len(c1))]
+
+def get_led_col(trainline : TrainlineIndicies, i: int):
+    return RL_TRAIN_COL if i in trainline.rl \
+        else LR_TRAIN_COL if i in trainline.lr \
+        else STATION_COL if i in trainline.stations \
+        else TRACK_COL
+
+def make_timetable_frame(prev : TrainlineIndicies, current : TrainlineIndicies, blend: float, num_leds: int):
+    """
+    Returns:
+        List[Tuple[int, int, int]]: a frame blending from prev to current
+    """
+    frame = []
+    for i in range(num_leds):
+        lerped_col = lerp_col(get_led_col(prev, i), get_led_col(current, i), blend)
+        frame.append((lerped_col[0], lerped_col[1], lerped_col[2]))
+    return frame
+
+class TrainlineRenderer:
+    """draws the latest timetables to one output, blending trains between leds as they move"""
+
+    def __init__(self, output, num_leds, clock_ms=clock.ticks_ms):
+        self.output = output
+        self.num_leds = num_leds
+        self._clock_ms = clock_ms
+        self._timetables = None
+        self._timetables_tickms = 0
+        self._showing_error = False
+        self._prev_trainline = None
+        self._current_trainline = None
+        self._last_change_tickms = 0
+
+    def set_timetables(self, timetables : trains_azure.Timetables) -> None:
+        self._timetables = timetables
+        self._timetables_tickms = self._clock_ms()
+        self._showing_error = False
+
+    def show_error(self) -> None:
+        """stays up until the next set_timetables()"""
+        self.output.write_frame([ERROR_COL] * self.num_leds)
+        self._showing_error = True
+
+    def render(self) -> None:
+        if self._timetables is None or self._showing_error:
+            return
+
+        now_ticksms = self._clock_ms()
+        generated_age_s = SPEED_MULT * clock.ticks_diff(now_ticksms, self._timetables_tickms)/1000
+        now = self._timetables.generatedAt + (generated_age_s/60/60)
+
+        new_trainline = \
+            calc_timetable_indicies_at(now, self._timetables.lr_timetable, self._timetables.rl_timetable, self.num_leds)
+
+        if self._prev_trainline is None:
+            self._current_trainline = new_trainline
+            self._prev_trainline = new_trainline
+            self._last_change_tickms = now_ticksms
+
+        if self._current_trainline.lr != new_trainline.lr or self._current_trainline.rl != new_trainline.rl:
+            self._last_change_tickms = now_ticksms
+            self._prev_trainline = self._current_trainline
+            self._current_trainline = new_trainline
+
+        s_since_change = clock.ticks_diff(now_ticksms, self._last_change_tickms)/1000
+        blend = min(1, s_since_change/CHANGE_BLEND_DURATION)
+
+        self.output.write_frame(make_timetable_frame(self._prev_trainline, self._current_trainline, blend, self.num_leds))
+
+def run(renderers, feed=None, refresh_interval=LED_REFRESH_INTERVAL) -> None:
+    """fetches timetables and draws them to every renderer, forever. pushed updates from feed arrive as they happen,
+    polling is the fallback while the feed is down or if there isn't one."""
+    last_poll_tickms : int = None
+
+    while True:
+        now_ticksms = clock.ticks_ms()
+
+        if feed is not None and feed.is_connect_due():
+            feed.connect()
+
+        new_timetables = feed.poll() if feed is not None else None
+
+        # no need to poll while the feed's open, the snapshot's on its way
+        if new_timetables is None and (feed is None or not feed.is_open()) \
+                and (last_poll_tickms is None or clock.ticks_diff(now_ticksms, last_poll_tickms) >= NET_REFRESH_INTERVAL*1000):
+            print("update start")
+            last_poll_tickms = now_ticksms
+            new_timetables = trains_azure.get_timetables()
+            if new_timetables is None:
+                # stays up until the next poll or snapshot
+                for renderer in renderers:
+                    renderer.show_error()
+
+        if new_timetables is not None:
+            print(f"got new timetable at {now_ticksms}")
+            for renderer in renderers:
+                renderer.set_timetables(new_timetables)
+
+        for renderer in renderers:
+            renderer.render()
+
+        time.sleep(refresh_interval)
@@ -0,0 +1,259 @@
+import train_secrets
+import trains_azure
+import json
+import time
+
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+try:
+    import ussl as ssl
+except ImportError:
+    import ssl
+
+try:
+    import uerrno as errno
+except ImportError:
+    import errno
+
+# push channel from the trainline service. every message, both ways, is a 4-byte big-endian length then that many bytes of json.
+# on connect we send a subscribe message, the service replies with a snapshot and then sends updates whenever a service changes,
+# and a heartbeat when nothing has changed for HEARTBEAT_INTERVAL:
+#   { "type": "subscribe", "left_crs": "crs", "right_crs": "crs", "code": "auth code, only sent over tls" }
+#   { "type": "snapshot", "lr": [...], "rl": [...], "now": decimal-hours }
+#   { "type": "update", "dir": "lr"|"rl", "index": int, "service": [...] or null to remove, "now": decimal-hours }
+#   { "type": "heartbeat" }
+# to try it against serve_simulated() on a desktop: set HOST to the desktop's lan ip, USE_TLS to False and IS_ENABLED to True
+HOST = "ldbws-line.azurewebsites.net"
+PORT = 7072
+USE_TLS: bool = True
+# the service doesn't push yet, so stick to polling until it does
+IS_ENABLED: bool = False
+
+CONNECT_TIMEOUT = 5
+# connecting blocks, so after a drop or a failure wait this long before trying again, doubling each failure
+RECONNECT_INTERVAL = 10
+MAX_RECONNECT_INTERVAL = 120
+HEARTBEAT_INTERVAL = 5
+# if we hear nothing for this long the connection's dead, even if nobody told us
+FEED_TIMEOUT = HEARTBEAT_INTERVAL * 3
+MAX_MESSAGE_BYTES = 16384
+RECV_CHUNK_BYTES = 1024
+# what a non-blocking recv raises when there's nothing waiting. windows has its own code for it, and cpython's ssl its own error
+NOTHING_WAITING = (errno.EAGAIN, getattr(errno, "WSAEWOULDBLOCK", errno.EAGAIN))
+NOTHING_WAITING_ERRORS = (ssl.SSLWantReadError,) if hasattr(ssl, "SSLWantReadError") else ()
+
+def encode_message(msg) -> bytes:
+    payload = json.dumps(msg).encode()
+    return len(payload).to_bytes(4, "big") + payload
+
+def wrap_tls(sock, host):
+    if hasattr(ssl, "create_default_context"):
+        return ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+    return ssl.wrap_socket(sock, server_hostname=host)
+
+def apply_update(timetables, update):
+    """applies one update message to the timetables we already have
+
+    Args:
+        timetables (trains_azure.Timetables): from the last snapshot or update
+        update (Dict): an "update" message
+
+    Returns:
+        trains_azure.Timetables: a new copy, the original is untouched
+    """
+    lr_timetable = list(timetables.lr_timetable)
+    rl_timetable = list(timetables.rl_timetable)
+    timetable = lr_timetable if update["dir"] == "lr" else rl_timetable
+    index = update["index"]
+    service = update.get("service")
+
+    if service is None:
+        timetable.pop(index)
+    elif index == len(timetable):
+        timetable.append(service)
+    else:
+        timetable[index] = service
+
+    return trains_azure.Timetables(lr_timetable, rl_timetable, update["now"])
+
+class TimetableFeed:
+    """keeps a socket open to the push service and turns its messages into timetables. connect() blocks, so call it
+    only when is_connect_due() says so. poll() never blocks, so it can be called from the led loop."""
+
+    def __init__(self, host=HOST, port=PORT, use_tls=USE_TLS, left_crs=None, right_crs=None):
+        self._host = host
+        self._port = port
+        self._use_tls = use_tls
+        self._left_crs = left_crs or train_secrets.LEFT_STATION_CRS
+        self._right_crs = right_crs or train_secrets.RIGHT_STATION_CRS
+        self._sock = None
+        self._buffer = b""
+        self._timetables = None
+        self._last_message_time = 0
+        self._reconnect_interval = RECONNECT_INTERVAL
+        self._next_connect_time = 0
+
+    def is_connected(self) -> bool:
+        """true once we've had a snapshot on the current connection"""
+        return self._sock is not None and self._timetables is not None
+
+    def is_open(self) -> bool:
+        """true while we have a connection, even if the snapshot hasn't arrived yet"""
+        return self._sock is not None
+
+    def is_connect_due(self) -> bool:
+        """true when we're not connected and the backoff since the last drop or failure has passed"""
+        return self._sock is None and time.time() >= self._next_connect_time
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._buffer = b""
+        self._timetables = None
+        self._next_connect_time = time.time() + self._reconnect_interval
+
+    def connect(self) -> bool:
+        """(re)connects and subscribes. blocks for up to CONNECT_TIMEOUT plus a dns lookup.
+
+        Returns:
+            bool: False if we couldn't connect
+        """
+        self.close()
+        try:
+            addr = socket.getaddrinfo(self._host, self._port)[0][-1]
+            self._sock = socket.socket()
+            self._sock.settimeout(CONNECT_TIMEOUT)
+            self._sock.connect(addr)
+            subscribe = {"type": "subscribe", "left_crs": self._left_crs, "right_crs": self._right_crs}
+            if self._use_tls:
+                self._sock = wrap_tls(self._sock, self._host)
+                subscribe["code"] = train_secrets.AZURE_AUTH_CODE
+            self._send(encode_message(subscribe))
+            self._sock.setblocking(False)
+        except Exception as e:
+            print(f"push feed couldn't connect: {e}")
+            self.close()
+            self._reconnect_interval = min(self._reconnect_interval * 2, MAX_RECONNECT_INTERVAL)
+            return False
+
+        self._last_message_time = time.time()
+        print(f"push feed subscribed to {self._host}:{self._port}")
+        return True
+
+    def poll(self) -> trains_azure.Timetables:
+        """reads whatever's arrived since last time. drops the connection if the service has gone quiet.
+
+        Returns:
+            Timetables: None if nothing has changed
+        """
+        if self._sock is None:
+            return None
+
+        changed = False
+        try:
+            for msg in self._read_messages():
+                self._last_message_time = time.time()
+                if msg["type"] == "snapshot":
+                    self._timetables = trains_azure.Timetables(msg["lr"], msg["rl"], msg["now"])
+                    self._reconnect_interval = RECONNECT_INTERVAL
+                    changed = True
+                elif msg["type"] == "update" and self._timetables is not None:
+                    self._timetables = apply_update(self._timetables, msg)
+                    changed = True
+        except Exception as e:
+            # reconnecting gets us a fresh snapshot, so there's no point trying to recover the stream
+            print(f"push feed dropped: {e}")
+            self.close()
+            return None
+
+        if time.time() - self._last_message_time > FEED_TIMEOUT:
+            print("push feed dropped: no heartbeat")
+            self.close()
+            return None
+
+        return self._timetables if changed else None
+
+    def _send(self, data) -> None:
+        # micropython's tls sockets only have write(), which sends everything when blocking
+        if hasattr(self._sock, "sendall"):
+            self._sock.sendall(data)
+        else:
+            self._sock.write(data)
+
+    def _read_messages(self):
+        read = self._sock.recv if hasattr(self._sock, "recv") else self._sock.read
+        while True:
+            try:
+                chunk = read(RECV_CHUNK_BYTES)
+            except OSError as e:
+                if e.args[0] in NOTHING_WAITING or isinstance(e, NOTHING_WAITING_ERRORS):
+                    break
+                raise
+            # micropython's non-blocking tls read gives None when there's nothing waiting
+            if chunk is None:
+                break
+            if not chunk:
+                raise OSError("closed by server")
+            self._buffer += chunk
+
+        while len(self._buffer) >= 4:
+            length = int.from_bytes(self._buffer[0:4], "big")
+            if length > MAX_MESSAGE_BYTES:
+                raise ValueError(f"message too long: {length}")
+            if len(self._buffer) < 4 + length:
+                break
+            payload = self._buffer[4:4 + length]
+            self._buffer = self._buffer[4 + length:]
+            yield json.loads(payload)
+
+def serve_simulated(port=PORT, update_interval=5, heartbeat_interval=HEARTBEAT_INTERVAL, server=None):
+    """stand-in publisher for testing the feed from a pico on the same network. pushes the simulated timetables, then
+    nudges one service later each update_interval seconds, with heartbeats in between. plain tcp, cpython only.
+    pass an already-listening server socket to use that instead of port. returns once the server socket is closed."""
+    if server is None:
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("", port))
+        server.listen(1)
+    print(f"publishing on port {server.getsockname()[1]}")
+
+    while True:
+        try:
+            conn, addr = server.accept()
+        except OSError:
+            return
+        print(f"subscriber {addr}")
+        try:
+            length = int.from_bytes(conn.recv(4), "big")
+            print(f"subscribed with {conn.recv(length)}")
+
+            timetables = trains_azure.get_simulated_timetables()
+            conn.sendall(encode_message(
+                {"type": "snapshot", "lr": timetables.lr_timetable, "rl": timetables.rl_timetable, "now": timetables.generatedAt}))
+
+            start_now = timetables.generatedAt
+            start = time.time()
+            last_update = start
+            index = 0
+            while True:
+                time.sleep(min(update_interval, heartbeat_interval))
+                if time.time() - last_update < update_interval:
+                    conn.sendall(encode_message({"type": "heartbeat"}))
+                    continue
+                last_update = time.time()
+                index = (index + 1) % len(timetables.lr_timetable)
+                service = [{"crs": stn["crs"], "time": stn["time"] + 0.05} for stn in timetables.lr_timetable[index]]
+                now = start_now + (time.time() - start)/60/60
+                update = {"type": "update", "dir": "lr", "index": index, "service": service, "now": now}
+                timetables = apply_update(timetables, update)
+                conn.sendall(encode_message(update))
+        except OSError as e:
+            print(f"subscriber gone: {e}")
+        conn.close()
+
+if __name__=="__main__":
+    serve_simulated()